@@ -1,9 +1,17 @@
-from typing import Union, Optional
+from typing import Iterable, Iterator, Union, Optional
+import asyncio
+import atexit
+import contextlib
+import functools
+import itertools
 import logging
-import time
+import operator
+import re
 import sqlite3
+import time
 
-import requests
+import aiohttp
+import orjson
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(
@@ -11,51 +19,225 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+# Results database shared by every upsert in the process
+DATABASE_PATH: str = "./request_results.db"
+_CONN: Optional[sqlite3.Connection] = None
+# Tables created on `_CONN` so far; their temporary staging tables only 
+# live as long as the connection does
+_CREATED_TABLES: set[str] = set()
+
+# Table and column names are interpolated into SQL, so only plain 
+# identifiers are accepted
+_IDENTIFIER_PATTERN: re.Pattern = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+# Column definitions of every results table
+_RESULTS_TABLE_COLUMNS: str = """(
+    id INT PRIMARY KEY NOT NULL, 
+    title VARCHAR NOT NULL, 
+    body VARCHAR NULL, 
+    title_length INT 
+        GENERATED ALWAYS AS (length(title)) STORED NOT NULL
+)"""
+
+# SQLite's default limit on host parameters in a single statement
+SQLITE_MAX_VARIABLES: int = 999
+# Prepared statements kept per connection; sized so the upsert statements 
+# for every batch shape stay cached alongside the setup statements
+SQLITE_CACHED_STATEMENTS: int = 512
+
+# Transient server errors worth retrying
+RETRY_STATUS_CODES: frozenset[int] = frozenset({500, 502, 503, 504})
+
+# Connection pool settings for the shared HTTP session
+HTTP_POOL_SIZE: int = 100
+HTTP_POOL_SIZE_PER_HOST: int = 10
+DNS_CACHE_TTL: int = 300
+
+# On-disk cache of API responses keyed by URL
+API_CACHE_PATH: str = "./api_cache.db"
+API_CACHE_EXPIRE_AFTER: int = 3600
+
+
+def create_session(timeout: int = 60) -> aiohttp.ClientSession:
+    """Create an HTTP session backed by a keep-alive connection pool so 
+    that DNS lookups and TCP/TLS handshakes are reused across retries and 
+    endpoints. Must be called from within a running event loop.
+
+    Params:
+        timeout (int): Total timeout in seconds for each request. Default 
+            set to `timeout = 60`.
+
+    Returns:
+        aiohttp.ClientSession
+    """
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_POOL_SIZE, 
+        limit_per_host=HTTP_POOL_SIZE_PER_HOST, 
+        ttl_dns_cache=DNS_CACHE_TTL
+    )
+    return aiohttp.ClientSession(
+        connector=connector, 
+        timeout=aiohttp.ClientTimeout(total=timeout)
+    )
+
+
+def _connect_to_cache(path: Optional[str] = None) -> sqlite3.Connection:
+    conn = sqlite3.connect(path or API_CACHE_PATH)
+    conn.row_factory = sqlite3.Row
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS responses
+        (
+            url VARCHAR PRIMARY KEY NOT NULL, 
+            etag VARCHAR NULL, 
+            last_modified VARCHAR NULL, 
+            body BLOB NOT NULL, 
+            fetched_at REAL NOT NULL
+        );"""
+    )
+    return conn
+
+
+def get_cached_response(
+    url: str, 
+    path: Optional[str] = None
+) -> Optional[sqlite3.Row]:
+    """Look up a previously cached API response.
+
+    Params:
+        url (str): Request URL the response was cached under.
+        path (Optional[str]): Cache database path. Defaults to 
+            `API_CACHE_PATH` when not given.
+
+    Returns:
+        Optional[sqlite3.Row]: Row with `etag`, `last_modified`, `body` 
+            and `fetched_at` columns, or None if the URL is not cached.
+    """
+    with contextlib.closing(_connect_to_cache(path=path)) as conn:
+        return conn.execute(
+            "SELECT * FROM responses WHERE url = ?", (url,)
+        ).fetchone()
+
+
+def cache_response(
+    url: str, 
+    body: bytes, 
+    etag: Optional[str] = None, 
+    last_modified: Optional[str] = None, 
+    path: Optional[str] = None
+) -> None:
+    """Store an API response body along with its validators so later 
+    requests can be served from disk or revalidated with a conditional 
+    request.
+
+    Params:
+        url (str): Request URL to cache the response under.
+        body (bytes): Raw response body.
+        etag (Optional[str]): `ETag` header of the response.
+        last_modified (Optional[str]): `Last-Modified` header of the 
+            response.
+        path (Optional[str]): Cache database path. Defaults to 
+            `API_CACHE_PATH` when not given.
+    """
+    # Commits on success, rolls back on error, and always closes
+    with contextlib.closing(_connect_to_cache(path=path)) as conn, conn:
+        conn.execute(
+            """INSERT OR REPLACE INTO responses 
+            VALUES (?, ?, ?, ?, ?);""",
+            (url, etag, last_modified, body, time.time())
+        )
+
+
+def refresh_cached_response(
+    url: str, 
+    path: Optional[str] = None
+) -> None:
+    """Mark a cached API response as fresh again after the server 
+    confirmed it is unchanged, without rewriting its body.
+
+    Params:
+        url (str): Request URL the response was cached under.
+        path (Optional[str]): Cache database path. Defaults to 
+            `API_CACHE_PATH` when not given.
+    """
+    with contextlib.closing(_connect_to_cache(path=path)) as conn, conn:
+        conn.execute(
+            "UPDATE responses SET fetched_at = ? WHERE url = ?", 
+            (time.time(), url)
+        )
 
-def retry_request(
+
+async def retry_request(
+    session: aiohttp.ClientSession,
     num_retries: int = 5, 
-    success_list: list[int] = [200], 
+    success_list: frozenset[int] = frozenset({200}), 
     starting_sleep_time: Optional[Union[int, float]] = 0.5,
     **kwargs
-) -> requests.models.Response:
+) -> aiohttp.ClientResponse:
     """Retry API request with a pause that grows exponentially with each 
-    request until attempts are exhausted. 
+    request until attempts are exhausted. Connection errors, including 
+    ones while reading the body, and transient server errors are retried; 
+    the last response is returned (or the last connection error raised) 
+    once attempts run out. The returned response's body has already been 
+    read.
     
     Params:
-        num_retries (int): Number of times to retry request. Default set 
-            to `num_retires = 5`.
-        success_list (list[int]): Codes to consider successful 
-            responses. Default set to `success_list = [200]`.
+        session (aiohttp.ClientSession): Shared HTTP session used to make 
+            the request.
+        num_retries (int): Number of times to retry request. Must be at 
+            least 1. Default set to `num_retires = 5`.
+        success_list (frozenset[int]): Codes to consider successful 
+            responses. Default set to `success_list = frozenset({200})`. 
+            Other responses are only retried if their status is in 
+            `RETRY_STATUS_CODES`; the rest are returned immediately.
         starting_sleep_time (Optional[Union[int, float]]): Sleep time 
             between request attempts. If 0, 0.0, or None, requests will 
             continue to be made until the attempts equals `num_retries`. 
             Default set to `starting_sleep_time = 0.5`.
-        **kwargs: Arguments for `request.get()`.
+        **kwargs: Arguments for `session.get()`.
     
     Returns: 
-        response (requests.models.Response): API request response.
+        response (aiohttp.ClientResponse): API request response.
     """
+    if num_retries < 1:
+        raise ValueError(f"num_retries must be at least 1, got {num_retries}")
+
     seconds = starting_sleep_time
-    for _ in range(num_retries):
+    for attempt in range(1, num_retries + 1):
         try:
-            response = requests.get(**kwargs)
-            if response.status_code in success_list:
+            response = await session.get(**kwargs)
+            if (
+                response.status in success_list 
+                or response.status not in RETRY_STATUS_CODES 
+                or attempt == num_retries
+            ):
+                # Read the body here so that a reset or disconnect partway 
+                # through it is retried too; later reads return the 
+                # buffered bytes
+                await response.read()
                 return response
-            time.sleep(seconds)
-        except requests.exceptions.ConnectionError as e:
-            raise e
-        seconds *= 2
-    
-    return response
-
-
-def get_data(
+            logger.info(f"Status {response.status} on attempt {attempt}")
+            response.release()
+        except (
+            aiohttp.ClientConnectionError, aiohttp.ClientPayloadError
+        ) as e:
+            if attempt == num_retries:
+                raise e
+            logger.info(f"Connection error on attempt {attempt}: {e}")
+        if seconds:
+            await asyncio.sleep(seconds)
+            seconds *= 2
+
+
+async def get_data(
+    session: aiohttp.ClientSession,
     endpoint: str = "posts", 
     retry_attempts: int = 5
 ) -> list[dict]:
     """Get data from an API endpoint. 
     
     Params: 
+        session (aiohttp.ClientSession): Shared HTTP session used to make 
+            the request.
         endpoint (str): Endpoint of URL. Default set to 
             `endpoint = "posts"`.
         retry (bool): Boolean of whether to retry request attempt or 
@@ -69,60 +251,138 @@ def get_data(
     project: str = "get_data_from_api"
     url: str = f"{base_url}/{username}/{project}/{endpoint}"
 
-    logger.info("Making request")
+    # The cache is blocking SQLite I/O, so keep it off the event loop to 
+    # let concurrent requests proceed
+    cached: Optional[sqlite3.Row] = await asyncio.to_thread(
+        get_cached_response, url=url
+    )
+    if cached and time.time() - cached["fetched_at"] < API_CACHE_EXPIRE_AFTER:
+        logger.info(f"Using cached response for {url}")
+        return orjson.loads(cached["body"])
+
+    # Revalidate a stale cache entry instead of downloading it again
+    headers: dict[str, str] = {}
+    if cached and cached["etag"]:
+        headers["If-None-Match"] = cached["etag"]
+    if cached and cached["last_modified"]:
+        headers["If-Modified-Since"] = cached["last_modified"]
+
+    logger.info(f"Making request to {url}")
     request_args = {
         "url": url, 
-        "timeout": 60
+        "headers": headers
     }
-    response: requests.models.Response = retry_request(
-        num_retries=retry_attempts, **request_args
+    response: aiohttp.ClientResponse = await retry_request(
+        session=session, 
+        num_retries=retry_attempts, 
+        success_list=frozenset({200, 304}), 
+        **request_args
     )
     # Check for succesful status
     response.raise_for_status()
-    
-    logger.info("Successful response of data")
-    return response.json()
+
+    if response.status == 304:
+        # Only a conditional request built from a cache entry can be 
+        # answered with 304
+        if cached is None:
+            raise ValueError(f"Unexpected 304 Not Modified for {url}")
+        logger.info("Cached response is still valid")
+        response.release()
+        body: bytes = cached["body"]
+        await asyncio.to_thread(refresh_cached_response, url=url)
+    else:
+        logger.info("Successful response of data")
+        body = await response.read()
+        await asyncio.to_thread(
+            cache_response, 
+            url=url, 
+            body=body, 
+            etag=response.headers.get("ETag"), 
+            last_modified=response.headers.get("Last-Modified")
+        )
+    return orjson.loads(body)
+
+
+def to_columns(data: list[dict]) -> dict[str, list]:
+    """Pivot a list of dictionaries into one list per key for the columnar 
+    helpers `add_length()` and `filter_data()`.
+
+    Params: 
+        data (list[dict]): Row-oriented input data. Every dictionary must 
+            have the same keys; otherwise a `ValueError` is raised rather 
+            than dropping or misaligning values.
+
+    Returns: 
+        columns (dict[str, list]): Mapping of each key to its values, in 
+            row order. Empty if `data` is empty.
+    """
+    if not data:
+        return {}
+    keys = data[0].keys()
+    for i, row in enumerate(data):
+        if row.keys() != keys:
+            raise ValueError(
+                f"Row {i} has keys {sorted(row)}, expected {sorted(keys)}"
+            )
+    return {
+        key: list(map(operator.itemgetter(key), data)) for key in keys
+    }
 
 
-def add_length(data: list[dict], key: str) -> list[dict]:
-    """Add a new key to each dictionary containing the length of a given 
-    key's value.
+def add_length(data: dict[str, list], key: str) -> dict[str, list]:
+    """Add a new column containing the length of each of a given column's 
+    values. Standalone helper; `main()` leaves this to the generated 
+    `title_length` column in SQLite.
     
     Params: 
-        data (list[dict]): Input data. 
-        key (str): Dictionary key value to utilize for measuring its 
-            value's length. 
+        data (dict[str, list]): Columnar input data. 
+        key (str): Column to utilize for measuring its values' lengths. 
     
     Returns: 
-        data (list[dict]): Input data with a new key-value pair for each 
-            dictionary in the list.
+        data (dict[str, list]): Input data with a new `{key}_length` 
+            column.
     """
-    for i in data:
-        i[f"{key}_length"] = len(i[key])
+    # Kept serial on purpose: `len()` is O(1) for strings, so shipping rows 
+    # to worker processes would cost more in pickling than it could save
+    data[f"{key}_length"] = list(map(len, data[key]))
+    return data
 
 
-def filter_data(data: list[dict], key: str, min_length: int) -> list[dict]:
+def filter_data(
+    data: dict[str, list], 
+    key: str, 
+    min_length: int
+) -> dict[str, list]:
     """"Filter out data where the `key` value is not at least N 
-    characters.
+    characters. Standalone helper; `main()` filters in SQLite through 
+    `upsert_data(min_title_length=...)` instead.
     
     Params: 
-        data (list[dict]): Data to filter.
-        key (str): Dictionary key to use for filtering. 
+        data (dict[str, list]): Columnar data to filter.
+        key (str): Column to use for filtering. Must be present, e.g. 
+            populated by `add_length()`; a missing column raises a 
+            `KeyError`.
         min_length (int): Minimum length of `key`.
 
     Returns: 
-        filtered_data (list[dict])
+        filtered_data (dict[str, list])
     """
-    filtered_data = []
-    for i in data:
-        if i.get(key) >= min_length:
-            filtered_data.append(i)
+    # Build a boolean mask over the `key` column once, then select the 
+    # matching values from every column; each step runs in C
+    mask = list(
+        map(functools.partial(operator.le, min_length), data[key])
+    )
+    filtered_data = {
+        column: list(itertools.compress(values, mask)) 
+        for column, values in data.items()
+    }
 
     return filtered_data
 
 
 def connect_to_database(path: str) -> sqlite3.Connection:
-    """Connect to SQLite database. 
+    """Connect to SQLite database in autocommit mode and tune it for bulk 
+    writes. Transactions are managed explicitly by the caller.
     
     Params:
         path (str): Database path.
@@ -130,123 +390,326 @@ def connect_to_database(path: str) -> sqlite3.Connection:
     Returns: 
         sqlite3.Connection
     """
-    return sqlite3.connect(path)
+    conn = sqlite3.connect(
+        path, 
+        isolation_level=None, 
+        cached_statements=SQLITE_CACHED_STATEMENTS
+    )
+    # Negative cache sizes are in KiB, i.e. a 64 MiB page cache
+    conn.executescript(
+        """
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA cache_size=-65536;
+        """
+    )
+    return conn
+
+
+def _get_conn(path: Optional[str] = None) -> sqlite3.Connection:
+    global _CONN
+    if _CONN is None:
+        logger.info("Connecting to database")
+        _CONN = connect_to_database(path=path or DATABASE_PATH)
+    return _CONN
+
+
+# Registered once at import; reconnecting after a close reuses this hook
+@atexit.register
+def _close_conn() -> None:
+    global _CONN
+    if _CONN is not None:
+        logger.info("Closing connection to database")
+        _CONN.close()
+        _CONN = None
+        _CREATED_TABLES.clear()
+
+
+def _validate_identifier(name: str) -> str:
+    if not _IDENTIFIER_PATTERN.fullmatch(name):
+        raise ValueError(f"Invalid SQL identifier: {name!r}")
+    return name
+
+
+def _quote_identifier(name: str) -> str:
+    # Quoting lets names that are SQL keywords, e.g. `group`, be used as 
+    # tables and columns; validation keeps the quotes from being escaped
+    return f'"{_validate_identifier(name)}"'
+
+
+@contextlib.contextmanager
+def transaction(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """Run the enclosed statements in a single transaction, committing on 
+    success and rolling back on error. If a transaction is already open 
+    on the connection, the enclosed statements join it instead so that 
+    the outermost block decides when to commit.
+
+    Params:
+        conn (sqlite3.Connection): Database connection in autocommit mode.
+
+    Returns:
+        Iterator[sqlite3.Connection]
+    """
+    if conn.in_transaction:
+        yield conn
+        return
+
+    conn.execute("BEGIN")
+    try:
+        # The connection's context manager commits on success and rolls 
+        # back if the block raises
+        with conn:
+            yield conn
+    except BaseException:
+        logger.info("Transaction rolled back")
+        # Any CREATE TABLE in the transaction was rolled back as well
+        _CREATED_TABLES.clear()
+        raise
+
+
+def _migrate_title_length(cursor: sqlite3.Cursor, name: str) -> None:
+    # Tables created before `title_length` became a generated column store 
+    # it as a plain NOT NULL column, which upserts no longer supply. In 
+    # `table_xinfo`, a `hidden` value of 0 marks an ordinary column.
+    hidden: dict[str, int] = {
+        row[1]: row[6] 
+        for row in cursor.execute(
+            f"PRAGMA table_xinfo({_quote_identifier(name)})"
+        )
+    }
+    if hidden.get("title_length") != 0:
+        return
+
+    table: str = _quote_identifier(name)
+    migrated_table: str = _quote_identifier(f"{name}_migrated")
+
+    logger.info(f"Migrating table {name} to a generated title_length column")
+    cursor.execute(f"DROP TABLE IF EXISTS {migrated_table}")
+    cursor.execute(f"CREATE TABLE {migrated_table} {_RESULTS_TABLE_COLUMNS};")
+    cursor.execute(
+        f"""INSERT INTO {migrated_table} (id, title, body) 
+        SELECT id, title, body FROM {table};"""
+    )
+    cursor.execute(f"DROP TABLE {table}")
+    cursor.execute(f"ALTER TABLE {migrated_table} RENAME TO {table}")
 
 
 def create_table_if_not_exists(cursor: sqlite3.Cursor, name: str) -> None:
-    """Create a SQLite table if it does not yet exist.
+    """Create a SQLite table if it does not yet exist, along with an 
+    unindexed temporary staging table (`{name}_staging`) used to bulk 
+    load rows before merging them into it.
     
     Params: 
         cursor (sqlite3.Cursor): Database connection cursor. 
-        name (str): Table name. 
+        name (str): Table name. Must be a plain SQL identifier.
     """
+    table: str = _quote_identifier(name)
+    staging_table: str = _quote_identifier(f"{name}_staging")
+    # Statements are run one at a time rather than through `executescript()`, 
+    # which would commit any transaction the caller has open
     try:
         cursor.execute(
-            f"""CREATE TABLE IF NOT EXISTS {name}
+            f"CREATE TABLE IF NOT EXISTS {table} {_RESULTS_TABLE_COLUMNS};"
+        )
+        _migrate_title_length(cursor=cursor, name=name)
+        cursor.execute(
+            f"""CREATE TEMP TABLE IF NOT EXISTS {staging_table}
             (
-                id INT PRIMARY KEY NOT NULL, 
-                title VARCHAR NOT NULL, 
-                body VARCHAR NULL, 
-                title_length INT NOT NULL
+                id INT, 
+                title VARCHAR, 
+                body VARCHAR
             );"""
         )
     except sqlite3.Error as e:
         raise e
     
 
+def _chunks(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+@functools.lru_cache(maxsize=32)
+def _build_insert_sql(
+    table: str, 
+    columns: tuple[str, ...], 
+    num_rows: int
+) -> str:
+    row_placeholders: str = f"({', '.join('?' * len(columns))})"
+    columns_str: str = ", ".join(map(_quote_identifier, columns))
+    return f"""
+        INSERT INTO {_quote_identifier(table)} ({columns_str}) 
+        VALUES {", ".join([row_placeholders] * num_rows)};
+    """
+
+
+@functools.lru_cache(maxsize=32)
+def _build_upsert_sql(
+    table: str, 
+    source_table: str, 
+    columns: tuple[str, ...], 
+    merge_column: str, 
+    filter_column: Optional[str] = None
+) -> str:
+    columns_str: str = ", ".join(map(_quote_identifier, columns))
+    set_map: str = ", ".join(
+        [
+            f"{quoted}=excluded.{quoted}" 
+            for quoted in map(_quote_identifier, columns) 
+            if quoted != _quote_identifier(merge_column)
+        ]
+    )
+    # A WHERE clause is always emitted since it also resolves the parsing 
+    # ambiguity between a join's ON clause and the upsert's ON CONFLICT
+    where: str = (
+        f"length({_quote_identifier(filter_column)}) >= ?" 
+        if filter_column else "true"
+    )
+    # With only the merge column there is nothing to update on conflict
+    action: str = f"DO UPDATE SET {set_map}" if set_map else "DO NOTHING"
+    return f"""
+        INSERT INTO {_quote_identifier(table)} ({columns_str}) 
+        SELECT {columns_str} FROM {_quote_identifier(source_table)} 
+        WHERE {where}
+        ON CONFLICT({_quote_identifier(merge_column)}) {action};
+    """
+
+
 def upsert_data(
     data: list[dict],
     table_name: str, 
-    merge_column: str = "id"
+    merge_column: str = "id", 
+    min_title_length: int = 0
 ) -> None:
-    """Upsert data into SQLite database. 
+    """Upsert data into SQLite database. Runs in its own transaction 
+    unless called within an open `transaction()` block.
     
     Params:
-        cursor (sqlite3.Cursor): Database connection cursor. 
+        data (list[dict]): Data to upsert, with the same keys in every 
+            dictionary. `title_length` is generated by the database and 
+            must not be included.
         table_name (str): Table name to upsert into.
         merge_column (str): Column to use for upserting. Defaut set to 
             `merge_column = "id"`.
+        min_title_length (int): Rows whose `title` is shorter than this 
+            are skipped. If 0, no rows are filtered and `data` does not 
+            need a `title` column. Default set to `min_title_length = 0`.
     """
-    columns = data[0].keys()
-    # columns_str: str = ", ".join(columns)
-    placeholders: str = ", ".join("?" * len(columns))
-    set_map: str = ", ".join(
-        [
-            f"{column}=excluded.{column}" for column in columns 
-            if column != merge_column
-        ]
+    if not data:
+        logger.info(f"No data to upsert to table {table_name}")
+        return
+
+    columns: tuple[str, ...] = tuple(
+        _validate_identifier(column) for column in data[0].keys()
     )
-    values: list[tuple] = [tuple(item.values()) for item in data]
-    try:
-        logger.info("Connecting to database")
-        conn: sqlite3.Connection = connect_to_database(
-            path="./request_results.db"
-        )
+    _validate_identifier(merge_column)
+    _validate_identifier(table_name)
+    staging_table: str = f"{table_name}_staging"
+    # Fetch every column in order with one C-level call per row; this also 
+    # keeps rows aligned with `columns` regardless of dict insertion order
+    # `itemgetter` with a single key returns the bare value, not a tuple
+    values: Iterator[tuple] = (
+        map(operator.itemgetter(*columns), data) if len(columns) > 1 
+        else ((item[columns[0]],) for item in data)
+    )
+    # Bind as many rows per statement as the parameter limit allows
+    batch_size: int = SQLITE_MAX_VARIABLES // len(columns)
+    conn: sqlite3.Connection = _get_conn()
+    with transaction(conn):
         cursor: sqlite3.Cursor = conn.cursor()
-        logger.info(f"Creating table {table_name} if it does not exist yet")
-        create_table_if_not_exists(cursor=cursor, name=table_name)
+        if table_name not in _CREATED_TABLES:
+            logger.info(
+                f"Creating table {table_name} if it does not exist yet"
+            )
+            create_table_if_not_exists(cursor=cursor, name=table_name)
+            _CREATED_TABLES.add(table_name)
 
         logger.info(f"Upsert data to table {table_name}")
-        logger.info(f"Inserting/updating {len(values)} records")
-        upsert_sql: str = f"""
-            INSERT INTO {table_name} VALUES ({placeholders})
-            ON CONFLICT({merge_column}) DO UPDATE SET {set_map};
-        """
-        cursor.executemany(upsert_sql, values)
-
-        logger.info("Closing connection to database")
-        conn.commit()
-        conn.close()
-
-    except sqlite3.Error as e:
-        raise e
+        logger.info(f"Inserting/updating {len(data)} records")
+        # Bulk load into the unindexed staging table first so the primary 
+        # key index is only maintained once, during the merge
+        for batch in _chunks(values, batch_size):
+            insert_sql: str = _build_insert_sql(
+                table=staging_table, columns=columns, num_rows=len(batch)
+            )
+            cursor.execute(
+                insert_sql, list(itertools.chain.from_iterable(batch))
+            )
+        filter_column: Optional[str] = "title" if min_title_length else None
+        cursor.execute(
+            _build_upsert_sql(
+                table=table_name, 
+                source_table=staging_table, 
+                columns=columns, 
+                merge_column=merge_column, 
+                filter_column=filter_column
+            ), 
+            (min_title_length,) if filter_column else ()
+        )
+        logger.info(f"Upserted {cursor.rowcount} records")
+        cursor.execute(f"DELETE FROM {_quote_identifier(staging_table)}")
 
 
 def _drop_table(cursor: sqlite3.Cursor, table: str) -> None:
+    quoted_table: str = _quote_identifier(table)
     try:
         logger.info(f"Dropping table {table}")
-        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute(f"DROP TABLE IF EXISTS {quoted_table}")
+        _CREATED_TABLES.discard(table)
         logger.info(f"Table {table} dropped")
     except sqlite3.Error as e:
         raise e
 
 
-def main(endpoint: str = "posts") -> None:
-    """Retrieve and filter data from an API endpoint with results logged 
+def process_endpoint(data: list[dict], endpoint: str) -> None:
+    """Filter data retrieved from an API endpoint and upsert the results 
     to a SQLite database.
 
     Params: 
-        endpoint (str): Endpoint of URL to hit. Database table will be 
-            created with the same name. Default set to 
-            `endpoint = "posts"`.
+        data (list[dict]): Data retrieved from the endpoint.
+        endpoint (str): Endpoint the data was retrieved from. Database 
+            table will be created with the same name.
     """
-    # Get data from endpoint
-    logger.info("Making request to the REST API")
-    data: list[dict] = get_data(endpoint=endpoint)
-    logger.info(f"Length of retrieved data: {len(data)}")
+    logger.info(f"Length of retrieved data from {endpoint}: {len(data)}")
 
-    # Add length field to check title length
-    logger.info("Adding a new length key-value pair to track title's length")
-    add_length(data=data, key="title")
-
-    # Filter data
+    # Title length is a generated column, so the filter runs in SQLite
     min_length: int = 5
     logger.info(
-        "Filtering out data where length of `title` is not at least "
+        "Upserting data where length of `title` is at least "
         f"{min_length} characters long"
     )
-    filtered_data: list[dict] = filter_data(
-        data=data, key="title_length", min_length=min_length
-    )
-    logger.info(f"Length of filtered data: {len(filtered_data)}")
-
-    # Upload data to database
-    logger.info("Beginning process to upsert data to database")
     upsert_data(
-        data=filtered_data, table_name=endpoint, merge_column="id"
+        data=data, 
+        table_name=endpoint, 
+        merge_column="id", 
+        min_title_length=min_length
     )
+
+
+async def main(endpoints: list[str]) -> None:
+    """Retrieve and filter data from API endpoints with results logged 
+    to a SQLite database. Endpoints are requested concurrently over a 
+    single HTTP session.
+
+    Params: 
+        endpoints (list[str]): Endpoints of URL to hit. A database table 
+            will be created for each with the same name.
+    """
+    # Get data from endpoints
+    logger.info("Making requests to the REST API")
+    async with create_session() as session:
+        results: list[list[dict]] = await asyncio.gather(
+            *(get_data(session=session, endpoint=e) for e in endpoints)
+        )
+
+    # Commit every endpoint's upsert together
+    with transaction(_get_conn()):
+        for endpoint, data in zip(endpoints, results):
+            process_endpoint(data=data, endpoint=endpoint)
     logger.info("Process complete!")
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main(endpoints=["posts"]))
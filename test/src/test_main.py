@@ -1,16 +1,98 @@
+import asyncio
+import sqlite3
+from typing import Callable, Optional, Union
+
+import aiohttp
 import pytest
 
 from src.main import (
+    _CREATED_TABLES, 
+    _build_upsert_sql, 
+    _close_conn, 
+    _drop_table, 
+    _get_conn, 
     add_length, 
+    cache_response, 
     filter_data, 
+    get_cached_response, 
+    get_data, 
+    main, 
+    refresh_cached_response, 
     retry_request,
+    to_columns, 
+    upsert_data,
 )
 
 
+class MockResponse:
+    """Offline stand-in for `aiohttp.ClientResponse`."""
+    def __init__(
+        self, 
+        status: int = 200, 
+        body: bytes = b"[]", 
+        headers: Optional[dict[str, str]] = None, 
+        read_error: Optional[Exception] = None
+    ) -> None:
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+        self.read_error = read_error
+        self.released = False
+
+    async def read(self) -> bytes:
+        if self.read_error:
+            raise self.read_error
+        return self.body
+
+    def release(self) -> None:
+        self.released = True
+
+    def raise_for_status(self) -> None:
+        if self.status >= 400:
+            raise aiohttp.ClientResponseError(
+                request_info=None, history=(), status=self.status
+            )
+
+
+class MockSession:
+    """Offline stand-in for `aiohttp.ClientSession` that replays canned 
+    responses and records the arguments of each request."""
+    def __init__(self, responses: list[MockResponse]) -> None:
+        self.responses = responses
+        self.requests: list[dict] = []
+
+    async def get(self, **kwargs) -> MockResponse:
+        self.requests.append(kwargs)
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def mock_session() -> Callable[..., MockSession]:
+    """Factory for mock HTTP sessions. Each item is a status code, an 
+    exception raised while reading a 200 response's body, or a fully 
+    specified `MockResponse`.
+
+    Returns: 
+        Callable[..., MockSession]
+    """
+    def _create(
+        responses: list[Union[int, Exception, MockResponse]]
+    ) -> MockSession:
+        mock_responses: list[MockResponse] = []
+        for item in responses:
+            if isinstance(item, int):
+                item = MockResponse(status=item)
+            elif isinstance(item, Exception):
+                item = MockResponse(read_error=item)
+            mock_responses.append(item)
+        return MockSession(responses=mock_responses)
+
+    return _create
+
+
 @pytest.fixture
-def mock_data() -> list[dict]:
-    """Mock input data from API. This output would be achieved from the 
-    `get_data()` function. 
+def mock_rows() -> list[dict]:
+    """Mock input data from API as decoded from the response body.
     
     Returns: 
         list[dict]
@@ -23,16 +105,64 @@ def mock_data() -> list[dict]:
     ]
 
 
+@pytest.fixture
+def mock_data(mock_rows) -> dict[str, list]:
+    """Mock columnar input data from API. This output would be achieved 
+    from the `get_data()` function. 
+    
+    Returns: 
+        dict[str, list]
+    """
+    return to_columns(mock_rows)
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch) -> sqlite3.Connection:
+    """Point the shared results database connection at a temporary file 
+    for the duration of a test.
+
+    Params: 
+        tmp_path: Pytest fixture providing a temporary directory.
+        monkeypatch: Pytest fixture for patching module attributes.
+
+    Returns: 
+        sqlite3.Connection
+    """
+    _close_conn()
+    monkeypatch.setattr(
+        "src.main.DATABASE_PATH", str(tmp_path / "request_results.db")
+    )
+    yield _get_conn()
+    _close_conn()
+
+
+@pytest.fixture
+def api_cache(tmp_path, monkeypatch) -> str:
+    """Point the API response cache at a temporary file for the duration 
+    of a test.
+
+    Params: 
+        tmp_path: Pytest fixture providing a temporary directory.
+        monkeypatch: Pytest fixture for patching module attributes.
+
+    Returns: 
+        str: Cache database path.
+    """
+    path = str(tmp_path / "api_cache.db")
+    monkeypatch.setattr("src.main.API_CACHE_PATH", path)
+    return path
+
+
 @pytest.fixture
 def mock_request_args() -> dict:
-    """Mock request arguments for `requests.get()`.
+    """Mock request arguments for `aiohttp.ClientSession.get()`.
     
     Returns: 
         dict
     """
     return {
         "url": "https://my-json-server.typicode.com/jacobmartin221/get_data_from_api/posts", 
-        "timeout": 10
+        "timeout": aiohttp.ClientTimeout(total=10)
     }
 
 
@@ -47,8 +177,8 @@ def test_add_length(mock_data, key: str = "title") -> None:
     # data = list(mock_data)  # make a copy for safety
     add_length(data=mock_data, key=key)
     length_key = f"{key}_length"
-    for i in mock_data:
-        assert i[length_key] == len(i[key])
+    for value, length in zip(mock_data[key], mock_data[length_key]):
+        assert length == len(value)
 
 
 def test_filter_data(mock_data) -> None:
@@ -62,11 +192,504 @@ def test_filter_data(mock_data) -> None:
         data=mock_data, key="title_length", min_length=5
     )
 
-    # Length should be one less
-    assert len(filtered_data) == len(mock_data) - 1
+    # Length should be one less, for every column
+    for column, values in filtered_data.items():
+        assert len(values) == len(mock_data[column]) - 1
+
+
+def test_to_columns(mock_rows) -> None:
+    """Test pivoting row-oriented data into columns.
+    
+    Params: 
+        mock_rows: Function/fixture to create mock row data. 
+    """
+    columns = to_columns(mock_rows)
+    assert list(columns) == ["id", "title", "body"]
+    assert columns["id"] == [i["id"] for i in mock_rows]
+    assert to_columns([]) == {}
+
+
+def test_to_columns_inconsistent_keys(mock_rows) -> None:
+    """Test that rows with differing keys are rejected instead of having 
+    values silently dropped.
+    
+    Params: 
+        mock_rows: Function/fixture to create mock row data. 
+    """
+    with pytest.raises(ValueError):
+        to_columns(mock_rows + [{"id": 104, "title": "Post 104"}])
+    with pytest.raises(ValueError):
+        to_columns(mock_rows + [{**mock_rows[0], "extra": "x"}])
+
+
+def test_filter_data_missing_key(mock_data) -> None:
+    """Test that filtering on a column that was never added fails loudly 
+    instead of comparing `None` against the minimum length.
+    
+    Params: 
+        mock_data: Function/fixture to create mock data. 
+    """
+    with pytest.raises(KeyError):
+        filter_data(data=mock_data, key="title_length", min_length=5)
 
 
 def test_retry_request(mock_request_args) -> None:
     """Test the API via the `retry_request()` function."""
-    response = retry_request(**mock_request_args)
-    assert response.status_code == 200
+    async def _request() -> int:
+        async with aiohttp.ClientSession() as session:
+            response = await retry_request(
+                session=session, **mock_request_args
+            )
+            response.release()
+            return response.status
+
+    assert asyncio.run(_request()) == 200
+
+
+def test_cache_response(tmp_path) -> None:
+    """Test that a cached response can be read back with its validators.
+
+    Params: 
+        tmp_path: Pytest fixture providing a temporary directory.
+    """
+    path = str(tmp_path / "api_cache.db")
+    url = "https://example.com/posts"
+    assert get_cached_response(url=url, path=path) is None
+
+    cache_response(url=url, body=b"[]", etag='"abc"', path=path)
+    cached = get_cached_response(url=url, path=path)
+    assert cached["body"] == b"[]"
+    assert cached["etag"] == '"abc"'
+    assert cached["last_modified"] is None
+
+
+def test_refresh_cached_response(tmp_path) -> None:
+    """Test that refreshing a cached response only updates its fetch time.
+
+    Params: 
+        tmp_path: Pytest fixture providing a temporary directory.
+    """
+    path = str(tmp_path / "api_cache.db")
+    url = "https://example.com/posts"
+    cache_response(url=url, body=b"[]", etag='"abc"', path=path)
+    cached = get_cached_response(url=url, path=path)
+
+    refresh_cached_response(url=url, path=path)
+    refreshed = get_cached_response(url=url, path=path)
+    assert refreshed["fetched_at"] > cached["fetched_at"]
+    assert refreshed["body"] == cached["body"]
+    assert refreshed["etag"] == cached["etag"]
+
+
+def test_retry_request_transient_error(mock_session) -> None:
+    """Test that `retry_request()` retries a transient server error and 
+    returns immediately on a non-retryable one, without the network.
+    
+    Params: 
+        mock_session: Function/fixture to create mock HTTP sessions.
+    """
+    session = mock_session([503, 200])
+    response = asyncio.run(
+        retry_request(session=session, starting_sleep_time=0, url="")
+    )
+    assert response.status == 200
+    assert len(session.requests) == 2
+
+    session = mock_session([404, 200])
+    response = asyncio.run(
+        retry_request(session=session, starting_sleep_time=0, url="")
+    )
+    assert response.status == 404
+    assert len(session.requests) == 1
+
+
+def test_get_conn_reconnect_skips_atexit(database, monkeypatch) -> None:
+    """Test that reopening the shared connection after a close does not
+    register another exit hook.
+
+    Params:
+        database: Function/fixture providing a temporary database.
+        monkeypatch: Pytest fixture for patching module attributes.
+    """
+    registered: list[Callable] = []
+    monkeypatch.setattr("atexit.register", registered.append)
+
+    for _ in range(3):
+        _close_conn()
+        assert _get_conn() is not database
+
+    assert registered == []
+
+
+def test_upsert_data_merge_column_only(database) -> None:
+    """Test an upsert whose only column is the merge column, which 
+    `operator.itemgetter` would otherwise return as a bare value.
+
+    Params: 
+        database: Function/fixture providing a temporary database.
+    """
+    database.execute("CREATE TABLE ids (id INT PRIMARY KEY)")
+    database.execute("CREATE TEMP TABLE ids_staging (id INT)")
+    _CREATED_TABLES.add("ids")
+
+    upsert_data(data=[{"id": 1}, {"id": 2}], table_name="ids")
+    upsert_data(data=[{"id": 2}, {"id": 3}], table_name="ids")
+
+    ids = database.execute("SELECT id FROM ids ORDER BY id").fetchall()
+    assert ids == [(1,), (2,), (3,)]
+
+
+def test_upsert_data_invalid_identifier() -> None:
+    """Test that names which are not plain SQL identifiers are rejected 
+    before being interpolated into SQL."""
+    with pytest.raises(ValueError):
+        upsert_data(
+            data=[{"id": 1, "title": "Post 1"}], 
+            table_name="posts; DROP TABLE posts"
+        )
+    with pytest.raises(ValueError):
+        upsert_data(
+            data=[{"id": 1, "title = title; --": "Post 1"}], 
+            table_name="posts"
+        )
+
+
+def test_upsert_data_keyword_table_name(database, mock_rows) -> None:
+    """Test that table names which are SQL keywords are quoted rather than 
+    breaking the generated SQL.
+
+    Params: 
+        database: Function/fixture providing a temporary database.
+        mock_rows: Function/fixture to create mock row data. 
+    """
+    for table_name in ("group", "order", "values"):
+        upsert_data(data=mock_rows, table_name=table_name, min_title_length=5)
+        upsert_data(data=mock_rows, table_name=table_name, min_title_length=5)
+
+        count = database.execute(
+            f'SELECT count(*) FROM "{table_name}"'
+        ).fetchone()[0]
+        assert count == len(mock_rows) - 1
+
+        _drop_table(cursor=database.cursor(), table=table_name)
+        tables = database.execute(
+            "SELECT name FROM sqlite_master WHERE name = ?", (table_name,)
+        ).fetchall()
+        assert tables == []
+
+
+def test_upsert_data_filters_in_sql(database, mock_rows) -> None:
+    """Test that short titles are filtered out by SQLite and that 
+    `title_length` is generated by the database.
+
+    Params: 
+        database: Function/fixture providing a temporary database.
+        mock_rows: Function/fixture to create mock row data. 
+    """
+    upsert_data(data=mock_rows, table_name="posts", min_title_length=5)
+
+    rows = database.execute(
+        "SELECT id, title, title_length FROM posts ORDER BY id"
+    ).fetchall()
+    assert [row[0] for row in rows] == [100, 101, 102]
+    for _, title, title_length in rows:
+        assert title_length == len(title)
+
+
+def test_upsert_data_without_filter(database, mock_rows) -> None:
+    """Test that no rows are filtered out when no minimum title length is 
+    given.
+
+    Params: 
+        database: Function/fixture providing a temporary database.
+        mock_rows: Function/fixture to create mock row data. 
+    """
+    upsert_data(data=mock_rows, table_name="posts")
+
+    count = database.execute("SELECT count(*) FROM posts").fetchone()[0]
+    assert count == len(mock_rows)
+
+
+def test_upsert_data_migrates_title_length(database, mock_rows) -> None:
+    """Test that a table with the old, plain `title_length` column is 
+    migrated to the generated column while keeping its rows.
+
+    Params: 
+        database: Function/fixture providing a temporary database.
+        mock_rows: Function/fixture to create mock row data. 
+    """
+    database.execute(
+        """CREATE TABLE posts
+        (
+            id INT PRIMARY KEY NOT NULL, 
+            title VARCHAR NOT NULL, 
+            body VARCHAR NULL, 
+            title_length INT NOT NULL
+        );"""
+    )
+    database.execute("INSERT INTO posts VALUES (1, 'Post 1', 'Body', 6)")
+
+    upsert_data(data=mock_rows, table_name="posts", min_title_length=5)
+
+    rows = database.execute(
+        "SELECT id, title_length FROM posts ORDER BY id"
+    ).fetchall()
+    assert rows == [(1, 6), (100, 8), (101, 8), (102, 8)]
+    hidden = {
+        row[1]: row[6] 
+        for row in database.execute("PRAGMA table_xinfo(posts)")
+    }
+    assert hidden["title_length"] != 0
+
+
+def test_build_upsert_sql_merge_column_only() -> None:
+    """Test that an upsert of only the merge column renders valid SQL 
+    that leaves existing rows untouched."""
+    sql = _build_upsert_sql(
+        table="t", source_table="s", columns=("id",), merge_column="id"
+    )
+    assert "DO NOTHING" in sql
+
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (id INT PRIMARY KEY, name VARCHAR)")
+    conn.execute("CREATE TABLE s (id INT)")
+    conn.execute("INSERT INTO t VALUES (1, 'kept')")
+    conn.execute("INSERT INTO s VALUES (1), (2)")
+    conn.execute(sql)
+    assert conn.execute("SELECT * FROM t ORDER BY id").fetchall() == [
+        (1, "kept"), (2, None)
+    ]
+
+
+def test_retry_request_body_error(mock_session) -> None:
+    """Test that `retry_request()` retries a connection dropped while the 
+    response body is being read, and rejects fewer than one attempt.
+    
+    Params: 
+        mock_session: Function/fixture to create mock HTTP sessions.
+    """
+    session = mock_session(
+        [aiohttp.ClientPayloadError("Response payload is not completed"), 200]
+    )
+    response = asyncio.run(
+        retry_request(session=session, starting_sleep_time=0, url="")
+    )
+    assert response.status == 200
+    assert len(session.requests) == 2
+
+    with pytest.raises(ValueError):
+        asyncio.run(retry_request(session=session, num_retries=0, url=""))
+
+
+def test_upsert_data_batches(database) -> None:
+    """Test an upsert large enough to span several multi-row insert 
+    batches.
+
+    Params: 
+        database: Function/fixture providing a temporary database.
+    """
+    ids = list(range(1000))
+    upsert_data(
+        data=[
+            {"id": i, "title": f"Post {i}", "body": f"Incoming body {i}"} 
+            for i in ids
+        ], 
+        table_name="posts"
+    )
+
+    count, total = database.execute(
+        "SELECT count(*), sum(id) FROM posts"
+    ).fetchone()
+    assert (count, total) == (len(ids), sum(ids))
+    staged = database.execute("SELECT count(*) FROM posts_staging")
+    assert staged.fetchone()[0] == 0
+
+
+def test_upsert_data_updates_existing_row(database, mock_rows) -> None:
+    """Test that upserting an existing id updates the row in place.
+
+    Params: 
+        database: Function/fixture providing a temporary database.
+        mock_rows: Function/fixture to create mock row data. 
+    """
+    upsert_data(data=mock_rows, table_name="posts")
+    upsert_data(
+        data=[{"id": 100, "title": "Post 100 v2", "body": "Updated"}], 
+        table_name="posts"
+    )
+
+    rows = database.execute(
+        "SELECT title, body, title_length FROM posts WHERE id = 100"
+    ).fetchall()
+    assert rows == [("Post 100 v2", "Updated", 11)]
+    count = database.execute("SELECT count(*) FROM posts").fetchone()[0]
+    assert count == len(mock_rows)
+
+
+def test_main_rolls_back_all_endpoints(
+    database, 
+    mock_rows, 
+    monkeypatch
+) -> None:
+    """Test that a failure while processing one endpoint rolls back the 
+    upserts of every endpoint in the run.
+
+    Params: 
+        database: Function/fixture providing a temporary database.
+        mock_rows: Function/fixture to create mock row data. 
+        monkeypatch: Pytest fixture for patching module attributes.
+    """
+    responses = {
+        "posts": mock_rows, 
+        # Not a column of the results table, so the upsert fails
+        "comments": [{"id": 1, "title": "Comment 1", "extra": "x"}]
+    }
+
+    async def mock_get_data(session, endpoint: str) -> list[dict]:
+        return responses[endpoint]
+
+    monkeypatch.setattr("src.main.get_data", mock_get_data)
+    with pytest.raises(sqlite3.OperationalError):
+        asyncio.run(main(endpoints=["posts", "comments"]))
+
+    assert not database.in_transaction
+    assert not _CREATED_TABLES
+    tables = database.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table'"
+    ).fetchall()
+    assert tables == []
+
+
+def test_main_rolls_back_on_interrupt(
+    database, 
+    mock_rows, 
+    monkeypatch
+) -> None:
+    """Test that an interrupt which is not an `Exception`, e.g. Ctrl+C, 
+    still rolls back the run and forgets the tables it created.
+
+    Params: 
+        database: Function/fixture providing a temporary database. 
+        mock_rows: Function/fixture to create mock row data. 
+        monkeypatch: Pytest fixture for patching module attributes. 
+    """
+    async def mock_get_data(session, endpoint: str) -> list[dict]:
+        return mock_rows
+
+    def interrupt(data: list[dict], endpoint: str) -> None:
+        if endpoint == "comments":
+            raise KeyboardInterrupt
+        upsert_data(data=data, table_name=endpoint)
+
+    monkeypatch.setattr("src.main.get_data", mock_get_data)
+    monkeypatch.setattr("src.main.process_endpoint", interrupt)
+    with pytest.raises(KeyboardInterrupt):
+        asyncio.run(main(endpoints=["posts", "comments"]))
+
+    assert not database.in_transaction
+    assert not _CREATED_TABLES
+    tables = database.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table'"
+    ).fetchall()
+    assert tables == []
+
+
+def test_get_data_caches_response(api_cache, mock_session) -> None:
+    """Test that a fresh response is returned as rows and written to 
+    the cache along with its validators.
+
+    Params: 
+        api_cache: Function/fixture providing a temporary cache path.
+        mock_session: Function/fixture to create mock HTTP sessions.
+    """
+    session = mock_session(
+        [
+            MockResponse(
+                body=b'[{"id": 1, "title": "Post 1", "body": "Body"}]', 
+                headers={
+                    "ETag": '"abc"', 
+                    "Last-Modified": "Wed, 14 Oct 2026 00:00:00 GMT"
+                }
+            )
+        ]
+    )
+    data = asyncio.run(get_data(session=session, endpoint="posts"))
+
+    assert data == [{"id": 1, "title": "Post 1", "body": "Body"}]
+    assert session.requests[0]["headers"] == {}
+    cached = get_cached_response(url=session.requests[0]["url"])
+    assert cached["body"] == b'[{"id": 1, "title": "Post 1", "body": "Body"}]'
+    assert cached["etag"] == '"abc"'
+    assert cached["last_modified"] == "Wed, 14 Oct 2026 00:00:00 GMT"
+
+
+def test_get_data_fresh_cache_hit(api_cache, mock_session) -> None:
+    """Test that a fresh cache entry is returned without any request.
+
+    Params: 
+        api_cache: Function/fixture providing a temporary cache path.
+        mock_session: Function/fixture to create mock HTTP sessions.
+    """
+    session = mock_session([MockResponse(body=b'[{"id": 1}]')])
+    asyncio.run(get_data(session=session, endpoint="posts"))
+
+    data = asyncio.run(get_data(session=session, endpoint="posts"))
+    assert data == [{"id": 1}]
+    assert len(session.requests) == 1
+
+
+def test_get_data_revalidates_stale_cache(
+    api_cache, 
+    mock_session, 
+    monkeypatch
+) -> None:
+    """Test that a stale cache entry is revalidated with a conditional 
+    request and reused when the server answers 304 Not Modified.
+
+    Params: 
+        api_cache: Function/fixture providing a temporary cache path.
+        mock_session: Function/fixture to create mock HTTP sessions.
+        monkeypatch: Pytest fixture for patching module attributes.
+    """
+    not_modified = MockResponse(status=304, body=b"")
+    session = mock_session(
+        [
+            MockResponse(
+                body=b'[{"id": 1}]', 
+                headers={
+                    "ETag": '"abc"', 
+                    "Last-Modified": "Wed, 14 Oct 2026 00:00:00 GMT"
+                }
+            ), 
+            not_modified
+        ]
+    )
+    asyncio.run(get_data(session=session, endpoint="posts"))
+    url = session.requests[0]["url"]
+    cached = get_cached_response(url=url)
+
+    monkeypatch.setattr("src.main.API_CACHE_EXPIRE_AFTER", 0)
+    data = asyncio.run(get_data(session=session, endpoint="posts"))
+
+    assert data == [{"id": 1}]
+    assert session.requests[1]["headers"] == {
+        "If-None-Match": '"abc"', 
+        "If-Modified-Since": "Wed, 14 Oct 2026 00:00:00 GMT"
+    }
+    assert not_modified.released
+    refreshed = get_cached_response(url=url)
+    assert refreshed["fetched_at"] > cached["fetched_at"]
+    assert refreshed["body"] == cached["body"]
+
+
+def test_get_data_unexpected_not_modified(api_cache, mock_session) -> None:
+    """Test that a 304 Not Modified without a cache entry to fall back on 
+    is reported instead of being treated as cached data.
+
+    Params: 
+        api_cache: Function/fixture providing a temporary cache path.
+        mock_session: Function/fixture to create mock HTTP sessions.
+    """
+    session = mock_session([304])
+    with pytest.raises(ValueError):
+        asyncio.run(get_data(session=session, endpoint="posts"))